@@ -9,11 +9,32 @@
 """
 
 import json
-import yaml
 import os
 import shutil
-from collections import OrderedDict
+import stat
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 
+# 可选依赖：orjson用于更快地解析JSON，isal（ISA-L）用于更快地进行DEFLATE压缩
+# orjson.loads与json.loads都可直接解析UTF-8字节，无需先在Python层解码为str
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+# 支持以目录描述符调用scandir和open时（Linux等POSIX系统），按目录相对路径统计文件大小
+SCANDIR_SUPPORTS_FD = os.scandir in os.supports_fd and os.open in os.supports_dir_fd
+DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+
+@lru_cache(maxsize=None)
 def calculate_folder_size(folder_path):
     """
     计算指定文件夹的总大小。
@@ -21,32 +42,197 @@ def calculate_folder_size(folder_path):
     参数:
     - folder_path: 字符串，表示文件夹的路径。
 
+    返回:
+    - total_size: 整数，文件夹的总大小，以字节为单位。
+
+    结果按路径缓存，同一进程内重复查询同一文件夹不会再次遍历。
+    """
+    if SCANDIR_SUPPORTS_FD:
+        dir_fd = os.open(folder_path, DIR_OPEN_FLAGS)
+        try:
+            return calculate_folder_size_at(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    total_size = 0
+    # 使用scandir返回的DirEntry，避免对每个文件再调用一次getsize
+    stack = [folder_path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+    return total_size
+
+def calculate_folder_size_at(dir_fd):
+    """
+    计算已打开目录描述符所指文件夹的总大小。
+
+    scandir传入描述符时，DirEntry.stat会相对该目录调用fstatat，
+    内核无需为每个文件重新解析完整路径。
+
+    参数:
+    - dir_fd: 整数，已打开的目录文件描述符。
+
     返回:
     - total_size: 整数，文件夹的总大小，以字节为单位。
     """
     total_size = 0
-    for dirpath, dirnames, filenames in os.walk(folder_path):
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            total_size += os.path.getsize(filepath)
+    with os.scandir(dir_fd) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total_size += entry.stat(follow_symlinks=False).st_size
+            elif entry.is_dir(follow_symlinks=False):
+                sub_dir_fd = os.open(entry.name, DIR_OPEN_FLAGS, dir_fd=dir_fd)
+                try:
+                    total_size += calculate_folder_size_at(sub_dir_fd)
+                finally:
+                    os.close(sub_dir_fd)
     return total_size
 
-def convert_json_to_custom_yaml(json_file_path, dirname):
+def load_json_file(json_file_path):
+    """
+    以二进制方式读取并解析JSON文件。
+
+    参数：
+    - json_file_path: 字符串，JSON文件的路径。
+
+    返回：
+    - json_data: 解析后的JSON数据。
+    """
+    with open(json_file_path, 'rb') as json_file:
+        return json_loads(json_file.read())
+
+# 各字段按JSON值的类型选择格式化函数，用type()查表代替逐个isinstance判断。
+# 表中没有的类型直接转为字符串（description除外，未知类型输出空字符串）。
+
+# 字典类型的name字段合并为一行
+NAME_FORMATTERS = {
+    dict: lambda name: " | ".join([f"{k}: {v}" for k, v in name.items()]),
+}
+
+ID_FORMATTERS = {
+    list: lambda ids: ''.join([f'    - {id}\n' for id in ids]),
+}
+
+AUTHOR_FORMATTERS = {
+    str: lambda author: f'    - "{author}"\n',
+    list: lambda authors: ''.join([f'    - "{author}"\n' for author in authors]),
+}
+
+MAINTAINER_FORMATTERS = {
+    str: lambda maintainer: f'    - {maintainer}\n',
+    list: lambda maintainers: ''.join([f'    - {maintainer}\n' for maintainer in maintainers]),
+}
+
+# 多行description字段每行缩进四个空格
+DESCRIPTION_FORMATTERS = {
+    str: lambda description: "\n    ".join(description.splitlines()),
+    list: lambda description: "\n    ".join(description),
+    dict: lambda description: "\n    ".join([f"{k}: {v}" for k, v in description.items()]),
+}
+
+# 单个direct_download条目的YAML固定片段，字段值按顺序穿插其间。
+# 片段为模块级常量，渲染时用一次"".join拼接，不再逐条目格式化模板
+MOD_INFO_YAML_IDENT = '- type: direct_download\n  ident: "'
+MOD_INFO_YAML_NAME = '"\n  name: "'
+MOD_INFO_YAML_AUTHORS = '"\n  authors: \n'
+MOD_INFO_YAML_MAINTAINERS = '  maintainers: \n'
+MOD_INFO_YAML_DESCRIPTION = '  description: |\n    '
+MOD_INFO_YAML_CATEGORY = "\n  category: '"
+MOD_INFO_YAML_DEPENDENCIES = "'\n  dependencies:\n"
+MOD_INFO_YAML_SIZE = '  size: '
+MOD_INFO_YAML_URL = '\n  url: "'
+MOD_INFO_YAML_HOMEPAGE = '"\n  homepage: \'https://github.com/Kenan2000/CDDA-Structured-Kenan-Modpack\''
+
+def normalize_mod_info(item, dirname, folder_size):
+    """
+    将MOD_INFO条目的各字段统一整理为可直接填入YAML的字符串。
+
+    参数：
+    - item: 字典，modinfo.json中的一个MOD_INFO条目。
+    - dirname: 字符串，模组所在的目录名称，用于构建下载链接。
+    - folder_size: 整数，模组文件夹的总大小，以字节为单位。
+
+    返回：
+    - mod_info: 字典，键与render_mod_info使用的字段一一对应，值均为字符串。
+    """
+    name = item.get("name", "")
+    formatter = NAME_FORMATTERS.get(type(name))
+    name = formatter(name) if formatter is not None else str(name)
+
+    id_value = item.get("id", item.get("ident", "unknown"))
+    formatter = ID_FORMATTERS.get(type(id_value))
+    id_value = formatter(id_value) if formatter is not None else str(id_value)
+
+    authors = item.get("authors", "unknown")
+    formatter = AUTHOR_FORMATTERS.get(type(authors))
+    authors = formatter(authors) if formatter is not None else str(authors)
+
+    maintainers = item.get("maintainers", "unknown")
+    formatter = MAINTAINER_FORMATTERS.get(type(maintainers))
+    maintainers = formatter(maintainers) if formatter is not None else str(maintainers)
+
+    description = item.get("description", "No description provided.")
+    formatter = DESCRIPTION_FORMATTERS.get(type(description))
+    formatted_description = formatter(description) if formatter is not None else ""
+
+    return {
+        "id_value": id_value,
+        "name": name,
+        "authors": authors,
+        "maintainers": maintainers,
+        "description": formatted_description,
+        "category": str(item.get("category", "unknown")),
+        "dependencies": ''.join([f"    - '{dependency}'\n" for dependency in item.get("dependencies", [])]),
+        "size": str(folder_size),
+        # 构造下载链接
+        "url": f"https://alist.doiiars.com/d/Public/Cataclysmdda/{dirname}.zip",
+    }
+
+def render_mod_info(mod_info):
+    """
+    将整理好的MOD_INFO字段一次性渲染为一个YAML列表项。
+
+    固定片段与字段值组成一个元组，由"".join一次分配完成拼接。
+
+    参数：
+    - mod_info: 字典，normalize_mod_info的返回值。
+
+    返回：
+    - 字符串，单个direct_download条目的YAML文本。
+    """
+    return "".join((
+        MOD_INFO_YAML_IDENT, mod_info["id_value"],
+        MOD_INFO_YAML_NAME, mod_info["name"],
+        MOD_INFO_YAML_AUTHORS, mod_info["authors"],
+        MOD_INFO_YAML_MAINTAINERS, mod_info["maintainers"],
+        MOD_INFO_YAML_DESCRIPTION, mod_info["description"],
+        MOD_INFO_YAML_CATEGORY, mod_info["category"],
+        MOD_INFO_YAML_DEPENDENCIES, mod_info["dependencies"],
+        MOD_INFO_YAML_SIZE, mod_info["size"],
+        MOD_INFO_YAML_URL, mod_info["url"],
+        MOD_INFO_YAML_HOMEPAGE,
+    ))
+
+def convert_json_to_custom_yaml(json_file_path, dirname, folder_size=None):
     """
     将JSON文件内容转换为定制的YAML格式。
 
     参数：
     - json_file_path: 字符串，JSON文件的路径。
     - dirname: 字符串，包含JSON文件的目录名称，用于构建下载链接。
+    - folder_size: 整数，可选，已知的文件夹大小；未提供时调用calculate_folder_size计算。
 
     返回：
     - yaml_contents: 字符串，转换后的YAML内容。
     """
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as json_file:
-            json_data = json.load(json_file)
+        json_data = load_json_file(json_file_path)
     except FileNotFoundError:
-        print(f"文件 {json_file_path} 未找到。")
+        # 调用方不再预先检查文件是否存在，没有modinfo.json的文件夹直接跳过
         return ""
     except json.JSONDecodeError:
         print(f"文件 {json_file_path} 格式不正确。")
@@ -54,72 +240,25 @@ def convert_json_to_custom_yaml(json_file_path, dirname):
     except Exception as e:
         print(f"读取JSON文件时发生错误: {e}")
         return ""
-    
-    with open(json_file_path, 'r', encoding='utf-8') as json_file:
-        json_data = json.load(json_file)
 
-    yaml_contents = ""
+    parts = []
 
     if isinstance(json_data, list):
         for item in json_data:
-            # 处理字典类型的name字段
-            name = item.get("name", "")
-            if not name:
+            # 先按type过滤：modinfo.json中的大部分条目不是MOD_INFO，可以尽早跳过
+            if item.get("type") != 'MOD_INFO':
                 continue
-            type = item.get("type", "")
-            if type != 'MOD_INFO':
+            if not item.get("name"):
                 continue
-            if isinstance(name, dict):
-                name = " | ".join([f"{k}: {v}" for k, v in name.items()])
-
-            id_value = item.get("id", item.get("ident", "unknown"))
-            if isinstance(id_value, str):
-                id_value = f'{id_value}'
-            elif isinstance(id_value, list):
-                id_value = ''.join([f'    - {id}\n' for id in id_value])
-                
-            authors = item.get("authors", "unknown")
-            if isinstance(authors, str):
-                authors = [f'{authors}']
-                authors = ''.join([f'    - "{author}"\n' for author in authors])
-            elif isinstance(authors, list):
-                authors = ''.join([f'    - "{author}"\n' for author in authors])
-                
-            maintainers = item.get("maintainers", "unknown")
-            if isinstance(maintainers, str):
-                maintainers = [f'{maintainers}']
-                maintainers = ''.join([f'    - {maintainer}\n' for maintainer in maintainers])
-            elif isinstance(maintainers, list):
-                maintainers = ''.join([f'    - {maintainer}\n' for maintainer in maintainers])
-            
-            # 处理多行description字段
-            description = item.get("description", "No description provided.")
-            formatted_description = ""
-            if isinstance(description, str):
-                formatted_description = "\n    ".join(description.splitlines())
-            elif isinstance(description, list):
-                formatted_description = "\n    ".join(description)
-            elif isinstance(description, dict):
-                formatted_description = "\n    ".join([f"{k}: {v}" for k, v in description.items()])
-
-            # 构造homepage字段的URL
-            download_url = f"https://alist.doiiars.com/d/Public/Cataclysmdda/{dirname}.zip"
-            
-            folder_size = calculate_folder_size(dirname)
-            
-            yaml_contents = "- type: direct_download\n" 
-            yaml_contents += '  ident: "' + id_value + '"\n' 
-            yaml_contents += '  name: "' + name + '"\n' 
-            yaml_contents += "  authors: \n" + authors
-            yaml_contents += '  maintainers: \n' + maintainers
-            yaml_contents += "  description: |\n    " + formatted_description + "\n" 
-            yaml_contents += "  category: '" + item.get("category", "unknown") + "'\n" 
-            yaml_contents += "  dependencies:\n" + ''.join([f"    - '{dependency}'\n" for dependency in item.get("dependencies", [])]) 
-            yaml_contents += f"  size: {folder_size}\n" 
-            yaml_contents += '  url: "' + download_url + '"\n' 
-            yaml_contents += "  homepage: 'https://github.com/Kenan2000/CDDA-Structured-Kenan-Modpack'"
-
-        return yaml_contents
+
+            # 文件夹大小只在第一个需要输出的条目处计算一次，没有可输出条目时不遍历文件夹
+            if folder_size is None:
+                folder_size = calculate_folder_size(os.path.abspath(dirname))
+
+            mod_info = normalize_mod_info(item, dirname, folder_size)
+            parts.append(render_mod_info(mod_info))
+
+        return "\n\n".join(parts)
     else:
         print(f"文件 {json_file_path} 的格式不正确。期望的是一个列表。")
         return ""
@@ -127,48 +266,164 @@ def convert_json_to_custom_yaml(json_file_path, dirname):
 
 
 
-def find_folders_and_convert_json():
+def find_folders_and_convert_json(create_zips=False):
     """
     查找当前目录下的所有文件夹，并尝试转换包含的modinfo.json文件。
+
+    参数：
+    - create_zips: 布尔值，为True时同时将每个文件夹压缩为ZIP文件，
+      文件夹大小在压缩的同一次遍历中统计，不再单独遍历一次。
     """
     current_directory = os.getcwd()
-    folders = [f for f in os.listdir(current_directory) if os.path.isdir(os.path.join(current_directory, f))]
-
-    all_yaml_content = ''
+    with os.scandir(current_directory) as entries:
+        folder_entries = [entry for entry in entries if entry.is_dir()]
+    folders = [entry.name for entry in folder_entries]
+    folder_paths = [entry.path for entry in folder_entries]
 
-    for folder in folders:
-        json_file_path = os.path.join(current_directory, folder, 'modinfo.json')
+    yaml_file_path = os.path.join(current_directory, 'all_modinfo.yaml')
+    # 直接在DirEntry.path后拼接文件名，不再逐个调用os.path.join
+    json_file_paths = [entry.path + os.sep + 'modinfo.json' for entry in folder_entries]
+    yaml_file = None
 
-        if os.path.exists(json_file_path):
-            yaml_content = convert_json_to_custom_yaml(json_file_path, folder)
-            if yaml_content:
-                all_yaml_content += yaml_content + '\n\n'
+    # 读取JSON和统计大小主要在等待I/O，用线程池并行处理各文件夹；
+    # executor.map按文件夹顺序返回结果，输出顺序保持不变。
+    # 逐个文件夹直接写入输出文件，避免在内存中拼接全部YAML内容
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if create_zips:
+                folder_sizes = list(executor.map(pack_and_measure, folders, folder_paths))
+            else:
+                folder_sizes = repeat(None)
+            yaml_contents = executor.map(convert_json_to_custom_yaml, json_file_paths, folders, folder_sizes)
+            for yaml_content in yaml_contents:
+                if yaml_content:
+                    # 有内容可写时才打开输出文件，没有可转换的内容时不创建文件
+                    if yaml_file is None:
+                        yaml_file = open(yaml_file_path, 'a', encoding='utf-8', buffering=1 << 20)
+                    yaml_file.write(yaml_content)
+                    yaml_file.write('\n\n')
+    finally:
+        if yaml_file is not None:
+            yaml_file.close()
 
-    if all_yaml_content:
-        yaml_file_path = os.path.join(current_directory, 'all_modinfo.yaml')
-        with open(yaml_file_path, 'a', encoding='utf-8') as yaml_file:
-            yaml_file.write(all_yaml_content)
+    if yaml_file is not None:
         print(f'所有YAML内容已追加到 {yaml_file_path}')
     else:
         print('没有找到任何modinfo.json文件来转换。')
 
 
+# 已经压缩过的图片、音频和归档文件再次DEFLATE几乎没有收益，直接以存储方式写入ZIP
+STORED_SUFFIXES = frozenset({
+    '.png', '.jpg', '.jpeg', '.ogg', '.mp3', '.webm',
+    '.zip', '.gz', '.xz', '.zst',
+})
+
+
+def zip_info_from_stat(arcname, st):
+    """
+    根据已获取的stat结果构造ZipInfo，与ZipInfo.from_file一致，但不再重复调用os.stat。
+
+    参数：
+    - arcname: 字符串，条目在ZIP文件中的名称，目录无需以/结尾。
+    - st: os.stat_result，条目的stat结果。
+
+    返回：
+    - zinfo: zipfile.ZipInfo，条目的ZIP元数据。
+    """
+    is_dir = stat.S_ISDIR(st.st_mode)
+    if is_dir:
+        arcname += '/'
+    zinfo = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[0:6])
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16  # Unix attributes
+    if is_dir:
+        zinfo.external_attr |= 0x10  # MS-DOS directory flag
+    else:
+        zinfo.file_size = st.st_size
+    return zinfo
+
+
+def pack_and_measure(folder, folder_path):
+    """
+    将单个文件夹压缩为同名ZIP文件，并在同一次遍历中统计文件夹大小。
+
+    参数：
+    - folder: 字符串，文件夹名称，同时用作ZIP文件名。
+    - folder_path: 字符串，文件夹的完整路径。
+
+    返回：
+    - total_size: 整数，文件夹的总大小，以字节为单位，与calculate_folder_size一致。
+    """
+    total_size = 0
+    # Create a zip file with the folder's name
+    with zipfile.ZipFile(folder + '.zip', 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        stack = [(folder_path, '')]
+        while stack:
+            dir_path, arc_prefix = stack.pop()
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    # 每个条目只取一次stat，类型判断、大小统计和ZIP元数据都基于它
+                    st = entry.stat(follow_symlinks=False)
+                    is_link = stat.S_ISLNK(st.st_mode)
+                    if is_link:
+                        # 与shutil.make_archive一致：符号链接按其目标写入，
+                        # 指向文件时写入文件内容，指向目录时只写入目录条目而不深入遍历。
+                        # 大小统计仍与calculate_folder_size一致，不计入符号链接。
+                        # 悬空或循环的链接无法解析，与make_archive一样直接跳过
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                    arcname = arc_prefix + entry.name
+                    if stat.S_ISREG(st.st_mode):
+                        if not is_link:
+                            total_size += st.st_size
+                        zinfo = zip_info_from_stat(arcname, st)
+                        if os.path.splitext(entry.name)[1].lower() in STORED_SUFFIXES:
+                            zinfo.compress_type = zipfile.ZIP_STORED
+                        else:
+                            zinfo.compress_type = zip_file.compression
+                        with open(entry.path, 'rb') as src, zip_file.open(zinfo, 'w') as dest:
+                            shutil.copyfileobj(src, dest)
+                    elif stat.S_ISDIR(st.st_mode):
+                        zip_file.writestr(zip_info_from_stat(arcname, st), b'')
+                        if not is_link:
+                            stack.append((entry.path, arcname + '/'))
+    return total_size
+
+
+def use_isal_zlib():
+    """
+    让当前进程中的zipfile改用ISA-L实现的DEFLATE和CRC32。
+
+    zipfile在压缩时通过模块内的zlib和crc32完成工作，这里替换的是其私有名称，
+    会影响整个进程的zipfile读写，因此只作为create_zip_files进程池的initializer，
+    在专门负责压缩的工作进程中调用。
+
+    注意：ISA-L只接受0-3级压缩级别，替换后向zipfile传入compresslevel（例如6）会在运行时报错。
+    """
+    zipfile.zlib = isal_zlib
+    zipfile.crc32 = isal_zlib.crc32
+
+
 def create_zip_files():
     """
     压缩当前目录下的每个文件夹为ZIP文件。
+
+    压缩以CPU为主，各文件夹分发到进程池并行处理。
     """
     current_directory = os.getcwd()
-    folders = [f for f in os.listdir(current_directory) if os.path.isdir(os.path.join(current_directory, f))]
-
-    for folder in folders:
-        folder_path = os.path.join(current_directory, folder)
-        zip_file_name = folder
+    with os.scandir(current_directory) as entries:
+        folder_entries = [entry for entry in entries if entry.is_dir()]
+    folders = [entry.name for entry in folder_entries]
+    folder_paths = [entry.path for entry in folder_entries]
 
-        # Create a zip file with the folder's name
-        shutil.make_archive(zip_file_name, 'zip', folder_path)
+    # 安装了isal时，仅在压缩用的工作进程中切换到ISA-L
+    initializer = use_isal_zlib if isal_zlib is not None else None
+    with ProcessPoolExecutor(initializer=initializer) as executor:
+        for folder, _ in zip(folders, executor.map(pack_and_measure, folders, folder_paths)):
+            print(f'Folder "{folder}" has been zipped as "{folder}".')
 
-        print(f'Folder "{folder}" has been zipped as "{zip_file_name}".')
-        
 if __name__ == "__main__":
     find_folders_and_convert_json()
     # create_zip_files()
\ No newline at end of file